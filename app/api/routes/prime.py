@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List
 
+from app.core.cancellation import CancellationToken, DeadlineExceeded
+from app.core.config import settings
 from app.core.database import get_db, SessionLocal
 from app.schemas.prime import (
     PrimeCheckRequest,
-    PrimeCheckResponse
-    
+    PrimeCheckResponse,
+    PrimeCountResponse,
+    NthPrimeResponse,
+    NearestPrimeResponse
 )
 from app.schemas.job import (
     JobSubmitResponse,
     JobStatusResponse
 )
+from app.services.number_theory import HAS_GMPY2
 from app.services.prime_service import PrimeService
 from app.core.queue_manager import queue_manager
 
@@ -33,8 +39,21 @@ async def check_prime(
     # Generate transaction ID
     transaction_id = PrimeService.generate_transaction_id()
     
-    # Check if number is prime (with caching and optimization)
-    is_prime, was_cached = PrimeService.check_prime_with_cache(db, request.number)
+    # Check if number is prime (with caching and optimization).
+    # Runs off the event loop and gives up once the request deadline passes.
+    token = CancellationToken(timeout=settings.CHECK_TIMEOUT_SECONDS)
+    try:
+        is_prime, was_cached = await run_in_threadpool(
+            PrimeService.check_prime_with_cache, db, request.number, token
+        )
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=504,
+            detail=(
+                f"Checking {request.number} exceeded the {settings.CHECK_TIMEOUT_SECONDS:g}s deadline. "
+                "Use /api/v1/prime/check/async for large numbers."
+            )
+        )
     
     # Save to database
     db_record = PrimeService.create_prime_check(
@@ -88,7 +107,7 @@ async def get_job_status(job_id: str):
     Get the status of an async prime check job.
     
     - **job_id**: The unique job identifier returned from /check/async
-    - Returns job status: pending, processing, completed, or failed
+    - Returns job status: pending, processing, completed, failed, or cancelled
     """
     job_status = queue_manager.get_job_status(job_id)
     
@@ -98,6 +117,37 @@ async def get_job_status(job_id: str):
             detail=f"Job ID '{job_id}' not found"
         )
     
+    return _job_status_response(job_status)
+
+
+@router.delete("/job/{job_id}", response_model=JobStatusResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a pending or running async prime check job.
+    
+    - **job_id**: The unique job identifier returned from /check/async
+    - Pending jobs are dropped from the queue; running jobs stop at their next cancellation check
+    """
+    cancelled = queue_manager.cancel_job(job_id)
+    
+    if cancelled is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job ID '{job_id}' not found"
+        )
+    
+    job_status = queue_manager.get_job_status(job_id)
+    
+    if not cancelled:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job ID '{job_id}' has already finished with status '{job_status['status']}'"
+        )
+    
+    return _job_status_response(job_status)
+
+
+def _job_status_response(job_status: Dict[str, Any]) -> JobStatusResponse:
     # Prepare message based on status
     if job_status["status"] == "completed":
         if job_status["is_prime"]:
@@ -106,6 +156,8 @@ async def get_job_status(job_id: str):
             message = f"{job_status['number']} is not a prime number"
     elif job_status["status"] == "failed":
         message = f"Job failed: {job_status.get('error', 'Unknown error')}"
+    elif job_status["status"] == "cancelled":
+        message = "Job was cancelled"
     elif job_status["status"] == "processing":
         message = "Job is currently being processed"
     else:
@@ -124,6 +176,125 @@ async def get_job_status(job_id: str):
     )
 
 
+@router.get("/count", response_model=PrimeCountResponse)
+async def count_primes(
+    upto: int = Query(..., ge=0, le=settings.PRIME_COUNT_MAX, description="Count primes <= upto")
+):
+    """
+    Count the primes less than or equal to a bound, pi(upto).
+    
+    - **upto**: Inclusive upper bound
+    """
+    token = CancellationToken(timeout=settings.CHECK_TIMEOUT_SECONDS)
+    try:
+        count = await run_in_threadpool(PrimeService.count_primes, upto, token)
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Counting primes up to {upto} exceeded the {settings.CHECK_TIMEOUT_SECONDS:g}s deadline"
+        )
+    
+    return PrimeCountResponse(
+        upto=upto,
+        count=count,
+        message=f"There are {count} primes up to {upto}"
+    )
+
+
+@router.get("/nth/{n}", response_model=NthPrimeResponse)
+async def get_nth_prime(
+    n: int = Path(..., ge=1, le=settings.NTH_PRIME_MAX, description="1-based index of the prime")
+):
+    """
+    Get the nth prime number (the 1st prime is 2).
+    
+    - **n**: 1-based index of the prime
+    """
+    token = CancellationToken(timeout=settings.CHECK_TIMEOUT_SECONDS)
+    try:
+        prime = await run_in_threadpool(PrimeService.nth_prime, n, token)
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Finding the {_ordinal(n)} prime exceeded the {settings.CHECK_TIMEOUT_SECONDS:g}s deadline"
+        )
+    
+    return NthPrimeResponse(
+        n=n,
+        prime=prime,
+        message=f"The {_ordinal(n)} prime is {prime}"
+    )
+
+
+@router.get("/next/{n}", response_model=NearestPrimeResponse)
+async def get_next_prime(n: int, db: Session = Depends(get_db)):
+    """
+    Find the smallest prime greater than n.
+    
+    - **n**: Starting number (arbitrary precision)
+    """
+    return await _nearest_prime(db, n, "next")
+
+
+@router.get("/prev/{n}", response_model=NearestPrimeResponse)
+async def get_prev_prime(n: int, db: Session = Depends(get_db)):
+    """
+    Find the largest prime less than n.
+    
+    - **n**: Starting number (arbitrary precision)
+    """
+    return await _nearest_prime(db, n, "prev")
+
+
+async def _nearest_prime(db: Session, n: int, direction: str) -> NearestPrimeResponse:
+    # Pure-Python Miller-Rabin cannot search near 1000-digit numbers within the deadline
+    max_digits = settings.MAX_NUMBER_DIGITS
+    if not HAS_GMPY2:
+        max_digits = min(max_digits, settings.NEAREST_PRIME_MAX_DIGITS_WITHOUT_GMPY2)
+    if len(str(abs(n))) > max_digits:
+        raise HTTPException(
+            status_code=422,
+            detail=f"n must have at most {max_digits} digits"
+        )
+    
+    token = CancellationToken(timeout=settings.CHECK_TIMEOUT_SECONDS)
+    try:
+        db_record = await run_in_threadpool(PrimeService.find_nearest_prime, db, n, direction, token)
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Searching from {n} exceeded the {settings.CHECK_TIMEOUT_SECONDS:g}s deadline"
+        )
+    
+    if not db_record:
+        raise HTTPException(
+            status_code=404,
+            detail=f"There is no prime less than {n}"
+        )
+    
+    if direction == "next":
+        message = f"The next prime after {n} is {db_record.number}"
+    else:
+        message = f"The previous prime before {n} is {db_record.number}"
+    
+    return NearestPrimeResponse(
+        transaction_id=db_record.transaction_id,
+        number=n,
+        prime=db_record.number,
+        gap=abs(db_record.number - n),
+        message=message,
+        created_at=db_record.created_at
+    )
+
+
+def _ordinal(n: int) -> str:
+    if 10 <= n % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
 @router.get("/check/{transaction_id}", response_model=PrimeCheckResponse)
 async def get_check_by_transaction(
     transaction_id: str,
@@ -0,0 +1,199 @@
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; snapshot writes are then not serialized
+    fcntl = None
+
+
+class BloomFilter:
+
+    #In-memory Bloom filter of every number stored in prime_check_requests.
+    #A negative answer from might_contain() means the number was never checked, so the
+    #database lookup can be skipped. Until the filter is marked ready every number is a
+    #"maybe", which keeps callers correct while the startup scan is still running.
+    #Each worker process holds its own copy, so rows inserted by other workers only show up
+    #after a catch-up scan of rows newer than last_id (see PrimeService.sync_number_filter).
+    #Ids commit out of order across workers, so ids skipped below last_id are kept in missing_ids
+    #and rechecked by every scan until they show up or are old enough to be a rolled-back insert.
+
+    _HEADER = struct.Struct("<4sQIdQQ")  # magic, size_bits, num_hashes, fp_rate, count, last_id
+    _MAGIC = b"BLM1"
+    _MAX_MISSING_IDS = 10_000
+
+    def __init__(self, capacity: int = 1_000_000, fp_rate: float = 0.01):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be between 0 and 1")
+
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        # Optimal sizing: m = -n ln(p) / ln(2)^2 bits, k = (m / n) ln(2) hashes
+        self.size_bits = max(8, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.size_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.size_bits + 7) // 8)
+        self.count = 0
+        self.last_id = 0  # Highest prime_check_requests.id folded into the filter
+        self.synced_at = 0.0  # Monotonic time of the last catch-up scan
+        self.missing_ids: Dict[int, float] = {}  # Unseen ids below last_id -> monotonic time first missed
+        self.ready = False
+        self.lock = threading.Lock()
+
+    def _positions(self, number: int):
+        # Double hashing: position_i = h1 + i * h2 (mod m)
+        digest = hashlib.blake2b(str(number).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, number: int):
+        #Record that a number has been stored. Numbers already present are not counted again.
+        positions = list(self._positions(number))
+        with self.lock:
+            added = False
+            for pos in positions:
+                mask = 1 << (pos & 7)
+                if not self.bits[pos >> 3] & mask:
+                    self.bits[pos >> 3] |= mask
+                    added = True
+            if added:
+                self.count += 1
+
+    def might_contain(self, number: int) -> bool:
+        #False only if the number has definitely never been stored.
+        if not self.ready:
+            return True
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(number))
+
+    def mark_seen(self, row_id: int):
+        #Record that a row id was folded in. Scans must visit ids in ascending order.
+        now = time.monotonic()
+        with self.lock:
+            if self.missing_ids.pop(row_id, None) is not None or row_id <= self.last_id:
+                return
+            # Anything skipped may still be uncommitted; only the newest ids of a large jump are kept
+            first_gap = max(self.last_id + 1, row_id - self._MAX_MISSING_IDS)
+            for gap_id in range(first_gap, row_id):
+                self.missing_ids[gap_id] = now
+            self.last_id = row_id
+
+    def expire_missing(self, timeout: float):
+        #Stop rechecking ids missing for longer than `timeout`, and keep at most _MAX_MISSING_IDS.
+        cutoff = time.monotonic() - timeout
+        with self.lock:
+            expired = [row_id for row_id, since in self.missing_ids.items() if since < cutoff]
+            overflow = len(self.missing_ids) - len(expired) - self._MAX_MISSING_IDS
+            if overflow > 0:
+                live = sorted(row_id for row_id, since in self.missing_ids.items() if since >= cutoff)
+                expired.extend(live[:overflow])
+            for row_id in expired:
+                del self.missing_ids[row_id]
+
+    def resume_id(self) -> int:
+        #Highest id below which every committed row is known to be folded in.
+        with self.lock:
+            return min(self.missing_ids, default=self.last_id + 1) - 1
+
+    def claim_sync(self, interval: float) -> bool:
+        #True for exactly one caller once `interval` seconds have passed since the last catch-up scan.
+        now = time.monotonic()
+        with self.lock:
+            if now - self.synced_at < interval:
+                return False
+            self.synced_at = now
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        #Snapshot of the filter, used for health reporting.
+        fill = self.count / self.capacity
+        return {
+            "ready": self.ready,
+            "count": self.count,
+            "capacity": self.capacity,
+            "configured_fp_rate": self.fp_rate,
+            # Expected FP rate at the current load: (1 - e^(-kn/m))^k
+            "estimated_fp_rate": round(
+                (1 - math.exp(-self.num_hashes * self.count / self.size_bits)) ** self.num_hashes, 6
+            ),
+            "over_capacity": fill > 1
+        }
+
+    def save(self, path: str) -> bool:
+        #Persist the filter so the next startup only has to scan newer rows.
+        #Every worker process calls this on shutdown; only the first one holding the newest state
+        #writes, the rest find a snapshot at least as recent and skip. Returns True if written.
+        # Saving the resume point rather than last_id makes the next startup recheck open gaps
+        last_id = self.resume_id()
+        with self.lock:
+            header = self._HEADER.pack(
+                self._MAGIC, self.size_bits, self.num_hashes, self.fp_rate, self.count, last_id
+            )
+            data = bytes(self.bits)
+
+        with open(f"{path}.lock", "a+b") as lock_file:
+            if fcntl:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX)
+            if self._snapshot_last_id(path) >= last_id:
+                return False
+
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(data)
+            os.replace(tmp_path, path)
+        return True
+
+    def _snapshot_last_id(self, path: str) -> int:
+        # last_id of a compatible snapshot on disk, or -1 if there is none
+        try:
+            with open(path, "rb") as f:
+                header = f.read(self._HEADER.size)
+        except FileNotFoundError:
+            return -1
+        if len(header) != self._HEADER.size:
+            return -1
+        magic, size_bits, num_hashes, _, _, last_id = self._HEADER.unpack(header)
+        if magic != self._MAGIC or size_bits != self.size_bits or num_hashes != self.num_hashes:
+            return -1
+        return last_id
+
+    def load(self, path: str) -> bool:
+        #Load a snapshot written by save(). Returns False if it is missing or sized differently.
+        if not os.path.exists(path):
+            return False
+
+        with open(path, "rb") as f:
+            header = f.read(self._HEADER.size)
+            if len(header) != self._HEADER.size:
+                return False
+            magic, size_bits, num_hashes, fp_rate, count, last_id = self._HEADER.unpack(header)
+            if magic != self._MAGIC or size_bits != self.size_bits or num_hashes != self.num_hashes:
+                return False
+            data = f.read()
+
+        if len(data) != len(self.bits):
+            return False
+
+        with self.lock:
+            self.bits = bytearray(data)
+            self.count = count
+            self.last_id = last_id
+        return True
+
+
+# Global filter of every number in prime_check_requests
+number_filter = BloomFilter(
+    capacity=settings.BLOOM_FILTER_CAPACITY,
+    fp_rate=settings.BLOOM_FILTER_FP_RATE
+)
@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Optional
+
+
+# How many loop iterations long-running computations run between token checks
+CHECK_EVERY = 4096
+
+
+class OperationCancelled(Exception):
+    """Raised inside a computation whose cancellation token was cancelled."""
+
+
+class DeadlineExceeded(OperationCancelled):
+    """Raised inside a computation that ran past its token's deadline."""
+
+
+class CancellationToken:
+
+    #Cooperative cancellation flag with an optional deadline.
+    #Compute loops call check() every CHECK_EVERY iterations and unwind on the raised exception.
+    #With start=False the deadline clock only starts once start() is called, so time spent
+    #waiting before the computation does not count against it.
+
+
+    def __init__(self, timeout: Optional[float] = None, start: bool = True):
+        self._cancelled = threading.Event()
+        self.timeout: Optional[float] = timeout
+        self.deadline: Optional[float] = None
+        if timeout is not None and start:
+            self.set_deadline(timeout)
+
+    def set_deadline(self, timeout: float):
+        #Start the deadline clock: computations fail once `timeout` seconds have passed.
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+
+    def start(self):
+        #Start the clock for the timeout given at construction, unless it is already running.
+        if self.timeout is not None and self.deadline is None:
+            self.set_deadline(self.timeout)
+
+    def cancel(self):
+        #Request cancellation; the computation stops at its next check().
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self):
+        #Raise if the token was cancelled or its deadline has passed.
+        if self._cancelled.is_set():
+            raise OperationCancelled("Operation was cancelled")
+        if self.expired:
+            raise DeadlineExceeded(f"Operation exceeded its {self.timeout:g}s deadline")
@@ -18,8 +18,41 @@ class Settings(BaseSettings):
     DATABASE_NAME: str = "wealthy_db"
     
     # Queue Configuration
-    QUEUE_WORKERS: int = 4  # Number of background worker threads
+    QUEUE_WORKERS: int = 4  # Number of background worker threads at startup
+    QUEUE_MIN_WORKERS: int = 1  # Pool never shrinks below this many workers
+    QUEUE_MAX_WORKERS: int = 16  # Pool never grows beyond this many workers
+    QUEUE_SCALE_INTERVAL_SECONDS: float = 1.0  # How often the autoscaler samples the queue
+    QUEUE_SCALE_UP_WAIT_SECONDS: float = 0.5  # Wait of the oldest pending job that triggers a scale-up
+    QUEUE_SCALE_COOLDOWN_SECONDS: float = 5.0  # Minimum time between two resize decisions
+    QUEUE_WORKER_IDLE_SECONDS: float = 30.0  # Idle time after which a surplus worker retires
+    QUEUE_BATCH_SIZE: int = 32  # Maximum jobs a worker drains into one batch
+    QUEUE_BATCH_WAIT_MS: float = 10.0  # How long a worker waits to fill a batch (milliseconds)
     JOB_RETENTION_HOURS: int = 24  # How long to keep job data in memory (hours)
+    JOB_TIMEOUT_SECONDS: float = 60.0  # Deadline for a single async job once it starts processing
+    CHECK_TIMEOUT_SECONDS: float = 10.0  # Deadline for a synchronous /check request
+    
+    # Input limits
+    MAX_NUMBER_DIGITS: int = 1000  # Largest accepted number, in decimal digits
+    NEAREST_PRIME_MAX_DIGITS_WITHOUT_GMPY2: int = 400  # /prime/next and /prime/prev limit in pure Python
+    
+    # Prime counting
+    PRIME_COUNT_MAX: int = 10**10  # Largest upto accepted by /prime/count
+    NTH_PRIME_MAX: int = 455_052_511  # Largest n accepted by /prime/nth (pi(10^10))
+    
+    # Negative cache (Bloom filter of numbers already stored)
+    BLOOM_FILTER_ENABLED: bool = True
+    BLOOM_FILTER_CAPACITY: int = 1_000_000  # Expected number of stored numbers
+    BLOOM_FILTER_FP_RATE: float = 0.01  # Target false-positive rate at capacity
+    BLOOM_FILTER_PATH: Optional[str] = None  # Snapshot file; startup then only scans newer rows
+    BLOOM_FILTER_SYNC_SECONDS: float = 1.0  # Minimum time between catch-up scans for rows other workers inserted
+    BLOOM_FILTER_GAP_SECONDS: float = 60.0  # How long a skipped id is rechecked before it counts as a rolled-back insert
+    
+    # Cross-process result cache (shared memory, attached by every uvicorn worker)
+    SHARED_CACHE_ENABLED: bool = True
+    SHARED_CACHE_NAME: str = "wealthy_prime_cache"  # Segment name prefix; the layout is appended
+    SHARED_CACHE_SLOTS: int = 1 << 20  # Number of hash table slots (24 bytes each)
+    SHARED_CACHE_STRIPES: int = 64  # Number of independently locked slot ranges
+    SHARED_CACHE_LOCK_PATH: Optional[str] = None  # Lock file; defaults to /tmp/<name>.lock
     
     @property
     def DATABASE_URL(self) -> str:
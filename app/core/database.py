@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Integer, create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -34,4 +34,22 @@ def init_db():
     """Initialize database tables."""
     from app.models import PrimeCheckRequest, PrimeCheckJob
     Base.metadata.create_all(bind=engine)
+    _widen_number_columns()
+
+
+def _widen_number_columns():
+    """
+    Convert legacy 32-bit INTEGER number columns to NUMERIC.
+    create_all() does not alter tables that already exist.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in ("prime_check_requests", "prime_check_jobs"):
+            if not inspector.has_table(table):
+                continue
+            for column in inspector.get_columns(table):
+                if column["name"] == "number" and isinstance(column["type"], Integer):
+                    conn.execute(text(
+                        f"ALTER TABLE {table} ALTER COLUMN number TYPE NUMERIC USING number::numeric"
+                    ))
 
@@ -2,10 +2,12 @@ import queue
 import threading
 import time
 import uuid
-from typing import Dict, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Tuple
 from datetime import datetime
 from enum import Enum
 
+from app.core.cancellation import CancellationToken
+
 
 class JobStatus(Enum):
     """Job status enumeration."""
@@ -13,80 +15,158 @@ class JobStatus(Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class Job:
     #Represents a job in the queue.
     
-    def __init__(self, job_id: str, number: int):
+    def __init__(self, job_id: str, number: int, timeout: Optional[float] = None):
         self.job_id = job_id
         self.number = number
         self.status = JobStatus.PENDING
         self.result: Optional[bool] = None
         self.error: Optional[str] = None
         self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
         self.completed_at: Optional[datetime] = None
         self.transaction_id: Optional[str] = None
+        # The deadline starts when the number is actually computed, not when the job is queued
+        self.cancel_token = CancellationToken(timeout, start=False)
 
 
 class QueueManager:
     
-    #Manages an in-memory job queue with background worker threads.
+    #Manages an in-memory job queue with an autoscaling pool of background worker threads.
+    #The pool grows when jobs wait too long and shrinks when surplus workers sit idle.
     
     
-    def __init__(self, num_workers: int = 4):
+    def __init__(
+        self,
+        num_workers: int = 4,
+        min_workers: int = 1,
+        max_workers: int = 16,
+        scale_interval: float = 1.0,
+        scale_up_wait: float = 0.5,
+        scale_cooldown: float = 5.0,
+        idle_timeout: float = 30.0,
+        batch_size: int = 32,
+        batch_wait_ms: float = 10.0,
+        job_timeout: Optional[float] = 60.0
+    ):
         self.job_queue: queue.Queue = queue.Queue()
         self.jobs: Dict[str, Job] = {}
         self.jobs_lock = threading.Lock()
         self.num_workers = num_workers
-        self.workers = []
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.scale_interval = scale_interval
+        self.scale_up_wait = scale_up_wait
+        self.scale_cooldown = scale_cooldown
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.job_timeout = job_timeout
+        self.workers: List[threading.Thread] = []
+        self.workers_lock = threading.Lock()
+        self.busy_workers = 0
+        self.inflight_batch_jobs = 0
+        self.last_scale_at = 0.0
+        self.autoscaler: Optional[threading.Thread] = None
+        self._worker_seq = 0
         self.running = False
         self.process_job_callback: Optional[Callable] = None
+        self.process_batch_callback: Optional[Callable] = None
+        self.compute_batch_callback: Optional[Callable] = None
     
     def set_job_processor(self, callback: Callable):
         """
         Set the callback function that processes jobs.
-        Callback should accept (job_id, number, db_session) and return (is_prime, transaction_id, error).
+        Callback should accept (job_id, number, cancel_token) and return (is_prime, transaction_id, error).
         """
         self.process_job_callback = callback
     
+    def set_batch_processor(self, callback: Callable):
+        """
+        Set the callback function that resolves a micro-batch of jobs from the cache.
+        Callback should accept a list of (job_id, number) and return a dict mapping job_id to
+        (is_prime, transaction_id, error) for the jobs it resolved. Those jobs finish right away;
+        the rest of the batch is handed to the batch compute processor by the same worker.
+        """
+        self.process_batch_callback = callback
+    
+    def set_batch_compute_processor(self, callback: Callable):
+        """
+        Set the callback function that computes the cache misses of a micro-batch.
+        Callback should accept a list of (job_id, number, cancel_token) and return a dict mapping
+        job_id to (is_prime, transaction_id, error). Without it, misses go to the job processor one by one.
+        """
+        self.compute_batch_callback = callback
+    
     def start(self):
-        #Start background worker threads.
+        #Start background worker threads and the autoscaler.
         if self.running:
             return
         
         self.running = True
-        for i in range(self.num_workers):
-            worker = threading.Thread(
-                target=self._worker,
-                name=f"QueueWorker-{i+1}",
-                daemon=True
-            )
-            worker.start()
-            self.workers.append(worker)
+        initial = max(self.min_workers, min(self.num_workers, self.max_workers))
+        with self.workers_lock:
+            self._spawn_workers(initial)
+            self.last_scale_at = time.monotonic()
         
-        print(f"✓ Queue manager started with {self.num_workers} workers")
+        self.autoscaler = threading.Thread(
+            target=self._autoscale,
+            name="QueueAutoscaler",
+            daemon=True
+        )
+        self.autoscaler.start()
+        
+        print(
+            f"✓ Queue manager started with {initial} workers "
+            f"(min={self.min_workers}, max={self.max_workers})"
+        )
     
     def stop(self):
         #Stop all worker threads gracefully.
         self.running = False
         
+        if self.autoscaler:
+            self.autoscaler.join(timeout=5)
+            self.autoscaler = None
+        
+        with self.workers_lock:
+            workers = list(self.workers)
+        
         # Add poison pills to wake up all workers
-        for _ in range(self.num_workers):
+        for _ in range(len(workers)):
             self.job_queue.put(None)
         
         # Wait for all workers to finish
-        for worker in self.workers:
+        for worker in workers:
             worker.join(timeout=5)
         
-        self.workers.clear()
+        with self.workers_lock:
+            self.workers.clear()
         print("✓ Queue manager stopped")
     
+    def get_stats(self) -> Dict[str, Any]:
+        #Snapshot of the worker pool, used for health reporting.
+        with self.workers_lock:
+            return {
+                "workers": len(self.workers),
+                "busy_workers": self.busy_workers,
+                "inflight_batch_jobs": self.inflight_batch_jobs,
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "queue_depth": self.job_queue.qsize(),
+                "oldest_wait_seconds": round(self._oldest_pending_age(), 3)
+            }
+    
     def submit_job(self, number: int) -> str:
         #Submit a new prime checking job to the queue.
         #Returns the job_id immediately.
         job_id = self._generate_job_id()
-        job = Job(job_id=job_id, number=number)
+        job = Job(job_id=job_id, number=number, timeout=self.job_timeout)
         
         with self.jobs_lock:
             self.jobs[job_id] = job
@@ -113,59 +193,258 @@ class QueueManager:
                 "completed_at": job.completed_at
             }
     
+    def cancel_job(self, job_id: str) -> Optional[bool]:
+        #Cancel a pending or running job.
+        #Pending jobs are skipped by workers; running jobs stop at their next cancellation check.
+        #Returns None if the job doesn't exist, False if it had already finished.
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job.status not in (JobStatus.PENDING, JobStatus.PROCESSING):
+                return False
+            
+            job.cancel_token.cancel()
+            job.status = JobStatus.CANCELLED
+            job.error = "Job was cancelled"
+            job.completed_at = datetime.now()
+            return True
+    
     def _worker(self):
         #Worker thread that processes jobs from the queue.
+        #Retires itself once it has been idle for idle_timeout and the pool is above min_workers.
         print(f"Worker {threading.current_thread().name} started")
+        idle_since = time.monotonic()
         
         while self.running:
             try:
                 # Get job from queue with timeout
                 job_id = self.job_queue.get(timeout=1)
-                
-                # Poison pill check
-                if job_id is None:
-                    break
-                
-                self._process_job(job_id)
-                
             except queue.Empty:
+                if self._try_retire(idle_since):
+                    break
                 continue
+            
+            # Poison pill check
+            if job_id is None:
+                break
+            
+            batch, stop_after = self._drain_batch(job_id)
+            
+            with self.workers_lock:
+                self.busy_workers += 1
+                self.inflight_batch_jobs += len(batch)
+            try:
+                self._process_batch(batch)
             except Exception as e:
                 print(f"Worker error: {e}")
+            finally:
+                with self.workers_lock:
+                    self.busy_workers -= 1
+                    self.inflight_batch_jobs -= len(batch)
+                idle_since = time.monotonic()
+            
+            if stop_after:
+                break
     
-    def _process_job(self, job_id: str):
-        #Process a single job.
+    def _drain_batch(self, first_job_id: str) -> Tuple[List[str], bool]:
+        #Collect up to batch_size job ids, waiting at most batch_wait_ms for more to arrive.
+        #Returns (job_ids, stop_after) where stop_after is set if a poison pill was drained.
+        batch = [first_job_id]
+        deadline = time.monotonic() + self.batch_wait_ms / 1000
+        
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    job_id = self.job_queue.get(timeout=remaining)
+                else:
+                    job_id = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if job_id is None:
+                return batch, True
+            batch.append(job_id)
+        
+        return batch, False
+    
+    def _spawn_workers(self, count: int):
+        #Start `count` new worker threads. Caller must hold workers_lock.
+        for _ in range(count):
+            self._worker_seq += 1
+            worker = threading.Thread(
+                target=self._worker,
+                name=f"QueueWorker-{self._worker_seq}",
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+    
+    def _try_retire(self, idle_since: float) -> bool:
+        #Remove the calling worker from the pool if it is surplus and has been idle long enough.
+        now = time.monotonic()
+        if now - idle_since < self.idle_timeout:
+            return False
+        
+        with self.workers_lock:
+            if len(self.workers) <= self.min_workers:
+                return False
+            if now - self.last_scale_at < self.scale_cooldown:
+                return False
+            
+            current = threading.current_thread()
+            if current in self.workers:
+                self.workers.remove(current)
+            self.last_scale_at = now
+            remaining = len(self.workers)
+        
+        print(f"Worker {current.name} retired after idling ({remaining} workers remain)")
+        return True
+    
+    def _oldest_pending_age(self) -> float:
+        #Seconds the oldest still-pending job at the head of the queue has been waiting.
+        #Reflects the backlog right now, so a burst that has drained leaves no stale signal.
+        with self.job_queue.mutex:
+            queued = list(self.job_queue.queue)
+        
+        now = datetime.now()
         with self.jobs_lock:
-            job = self.jobs.get(job_id)
-            if not job:
-                return
-            job.status = JobStatus.PROCESSING
+            for job_id in queued:
+                job = self.jobs.get(job_id) if job_id else None
+                if job and job.status == JobStatus.PENDING:
+                    return (now - job.created_at).total_seconds()
+        return 0.0
+    
+    def _autoscale(self):
+        #Autoscaler thread that grows the pool when jobs back up.
+        #Scale-up needs both a backlog and either a long-waiting job or a saturated pool; scale-down
+        #is left to idle workers, so the two directions use different signals and do not flap.
+        while self.running:
+            time.sleep(self.scale_interval)
+            if not self.running:
+                break
+            
+            # Jobs drained into a running batch are still backlog until the batch resolves them
+            with self.workers_lock:
+                depth = self.job_queue.qsize() + self.inflight_batch_jobs
+            oldest_wait = self._oldest_pending_age() if depth else 0.0
+            now = time.monotonic()
+            
+            with self.workers_lock:
+                # Drop threads that exited without going through _try_retire
+                self.workers = [w for w in self.workers if w.is_alive()]
+                alive = len(self.workers)
+                
+                if alive < self.min_workers:
+                    self._spawn_workers(self.min_workers - alive)
+                    self.last_scale_at = now
+                    continue
+                
+                if depth == 0 or alive >= self.max_workers:
+                    continue
+                if now - self.last_scale_at < self.scale_cooldown:
+                    continue
+                
+                idle = alive - self.busy_workers
+                saturated = idle <= 0 or (alive and self.busy_workers / alive >= 0.8)
+                if oldest_wait < self.scale_up_wait and not saturated:
+                    continue
+                
+                # Add enough workers to cover the backlog not already absorbed by idle ones
+                added = min(self.max_workers - alive, max(1, depth - max(idle, 0)))
+                self._spawn_workers(added)
+                self.last_scale_at = now
+                total = len(self.workers)
+            
+            print(f"Queue autoscaler added {added} workers (depth={depth}, workers={total})")
+    
+    def _process_batch(self, job_ids: List[str]):
+        #Process a micro-batch in two steps: resolve cached numbers with one lookup call and finish
+        #those jobs right away, then compute the misses together with one compute call.
+        started_at = datetime.now()
+        batch: List[Job] = []
+        with self.jobs_lock:
+            for job_id in job_ids:
+                job = self.jobs.get(job_id)
+                if not job or job.status != JobStatus.PENDING:
+                    # Missing, or cancelled while waiting in the queue
+                    continue
+                job.status = JobStatus.PROCESSING
+                job.started_at = started_at
+                batch.append(job)
+        
+        if not batch:
+            return
+        
+        results: Dict[str, Tuple[Optional[bool], Optional[str], Optional[str]]] = {}
+        if self.process_batch_callback:
+            try:
+                results = self.process_batch_callback([(job.job_id, job.number) for job in batch])
+            except Exception as e:
+                results = {job.job_id: (None, None, str(e)) for job in batch}
+        misses = self._finish_jobs(batch, results)
+        
+        if not misses:
+            return
         
         try:
-            # Call the job processor callback
-            if self.process_job_callback:
-                is_prime, transaction_id, error = self.process_job_callback(job_id, job.number)
-                
-                with self.jobs_lock:
-                    if error:
-                        job.status = JobStatus.FAILED
-                        job.error = error
-                    else:
-                        job.status = JobStatus.COMPLETED
-                        job.result = is_prime
-                        job.transaction_id = transaction_id
-                    job.completed_at = datetime.now()
+            # Call the compute callback, or the job processor once per miss
+            if self.compute_batch_callback:
+                results = self.compute_batch_callback(
+                    [(job.job_id, job.number, job.cancel_token) for job in misses]
+                )
+            elif self.process_job_callback:
+                results = {
+                    job.job_id: self.process_job_callback(job.job_id, job.number, job.cancel_token)
+                    for job in misses
+                }
             else:
-                with self.jobs_lock:
-                    job.status = JobStatus.FAILED
-                    job.error = "No job processor configured"
-                    job.completed_at = datetime.now()
-        
+                results = {
+                    job.job_id: (None, None, "No job processor configured")
+                    for job in misses
+                }
         except Exception as e:
-            with self.jobs_lock:
-                job.status = JobStatus.FAILED
-                job.error = str(e)
-                job.completed_at = datetime.now()
+            results = {job.job_id: (None, None, str(e)) for job in misses}
+        
+        missing = self._finish_jobs(misses, results)
+        self._finish_jobs(missing, {job.job_id: (None, None, "Job missing from batch result") for job in missing})
+    
+    def _finish_jobs(
+        self,
+        jobs: List[Job],
+        results: Dict[str, Tuple[Optional[bool], Optional[str], Optional[str]]]
+    ) -> List[Job]:
+        #Record the results of jobs that have one. Returns the still-running jobs left without a result.
+        completed_at = datetime.now()
+        remaining: List[Job] = []
+        with self.jobs_lock:
+            for job in jobs:
+                if job.status == JobStatus.CANCELLED:
+                    # Cancelled via cancel_job while running; keep its cancelled state
+                    continue
+                if job.job_id in results:
+                    self._finish_job(job, results[job.job_id], completed_at)
+                else:
+                    remaining.append(job)
+        return remaining
+    
+    def _finish_job(
+        self,
+        job: Job,
+        result: Tuple[Optional[bool], Optional[str], Optional[str]],
+        completed_at: datetime
+    ):
+        #Record a processor result on a job. Caller must hold jobs_lock.
+        is_prime, transaction_id, error = result
+        if error:
+            job.status = JobStatus.FAILED
+            job.error = error
+        else:
+            job.status = JobStatus.COMPLETED
+            job.result = is_prime
+            job.transaction_id = transaction_id
+        job.completed_at = completed_at
     
     def _generate_job_id(self) -> str:
         """Generate a unique job ID."""
@@ -0,0 +1,246 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locking then only covers threads
+    fcntl = None
+
+
+class SharedResultCache:
+
+    #Fixed-size open-addressing hash table in shared memory, mapping number -> (is_prime, smallest factor).
+    #Every uvicorn worker process attaches to the same segment, so a result computed by one worker
+    #is a cache hit in all of them. The table is split into stripes of contiguous slots; each stripe
+    #is guarded by an in-process lock plus an fcntl byte-range lock on a shared lock file, and
+    #probing never leaves a key's stripe. When a probe window is full the home slot is overwritten.
+    #The segment name carries the layout, so changing SLOTS/STRIPES starts a fresh segment instead of
+    #clashing with the old one. The header counts attached processes and the last one to close()
+    #unlinks the segment. A crashed worker leaves its count behind; unlink() removes the segment then.
+
+    _HEADER = struct.Struct("<4sQQQ")  # magic, slots, stripes, attached processes
+    _SLOT = struct.Struct("<qqB7x")  # key, smallest factor, flags
+    _MAGIC = b"SRC2"
+    _OCCUPIED = 1
+    _PRIME = 2
+    _MAX_PROBES = 8
+
+    _INT64_MIN = -(1 << 63)
+    _INT64_MAX = (1 << 63) - 1
+
+    def __init__(self):
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.name = ""
+        self.slots = 0
+        self.stripes = 0
+        self.stripe_slots = 0
+        self._stripe_locks: List[threading.Lock] = []
+        self._lock_file = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def attached(self) -> bool:
+        return self.shm is not None
+
+    def attach(self, name: str, slots: int = 1 << 20, stripes: int = 64, lock_path: Optional[str] = None):
+        #Create the shared segment, or attach to it if another worker already created it.
+        if self.attached:
+            return
+        if stripes <= 0 or slots < stripes:
+            raise ValueError("slots must be at least stripes, and stripes must be positive")
+
+        stripe_slots = slots // stripes
+        slots = stripe_slots * stripes
+        size = self._HEADER.size + slots * self._SLOT.size
+        name = self.segment_name(name, slots, stripes)
+
+        self.slots = slots
+        self.stripes = stripes
+        self.stripe_slots = stripe_slots
+        self._stripe_locks = [threading.Lock() for _ in range(stripes)]
+        if fcntl:
+            self._lock_file = open(lock_path or f"/tmp/{name}.lock", "a+b")
+
+        # Creating/attaching and the attach count are serialized across processes,
+        # so a worker never attaches to a segment that the last one is unlinking
+        self._lock_meta()
+        try:
+            try:
+                shm = _open_shared_memory(name, create=True, size=size)
+                # A fresh segment is zero-filled, i.e. every slot is empty
+                self._HEADER.pack_into(shm.buf, 0, self._MAGIC, slots, stripes, 1)
+            except FileExistsError:
+                shm = _open_shared_memory(name, create=False)
+                magic, _, _, attached = self._wait_for_header(shm)
+                if magic != self._MAGIC:
+                    shm.close()
+                    raise ValueError(f"Shared cache '{name}' has an unknown header")
+                self._HEADER.pack_into(shm.buf, 0, self._MAGIC, slots, stripes, attached + 1)
+        except Exception:
+            self._unlock_meta()
+            self._close_lock_file()
+            raise
+        self._unlock_meta()
+
+        self.shm = shm
+        self.name = name
+
+    @staticmethod
+    def segment_name(name: str, slots: int, stripes: int) -> str:
+        #Name of the segment holding a table with this layout.
+        return f"{name}_{slots}x{stripes}"
+
+    def _wait_for_header(self, shm: shared_memory.SharedMemory, timeout: float = 5.0) -> Tuple[bytes, int, int, int]:
+        # The creating worker writes the header right after creating the segment
+        deadline = time.monotonic() + timeout
+        while True:
+            header = self._HEADER.unpack_from(shm.buf, 0)
+            if header[0] == self._MAGIC or time.monotonic() >= deadline:
+                return header
+            time.sleep(0.01)
+
+    def close(self):
+        #Detach from the segment, unlinking it if this was the last attached process.
+        if not self.attached:
+            return
+        self._lock_meta()
+        try:
+            magic, slots, stripes, attached = self._HEADER.unpack_from(self.shm.buf, 0)
+            attached = max(attached - 1, 0)
+            self._HEADER.pack_into(self.shm.buf, 0, magic, slots, stripes, attached)
+            self.shm.close()
+            if attached == 0 and fcntl:
+                # Without fcntl the count is not reliable across processes, so leave the segment
+                self.unlink(self.name)
+        finally:
+            self._unlock_meta()
+        self.shm = None
+        self._close_lock_file()
+
+    @staticmethod
+    def unlink(segment: str):
+        #Remove a segment by its full name, e.g. one left behind by crashed workers.
+        try:
+            # Opened tracked, so unlink() below balances the resource tracker registration
+            shm = shared_memory.SharedMemory(name=segment)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+    def _close_lock_file(self):
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _lock_meta(self):
+        # Byte `stripes` of the lock file guards attach/close; bytes 0..stripes-1 guard the stripes
+        if self._lock_file:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_EX, 1, self.stripes)
+
+    def _unlock_meta(self):
+        if self._lock_file:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, self.stripes)
+
+    def _locate(self, number: int) -> Tuple[int, int]:
+        # Fibonacci hashing; the high bits pick the stripe, the rest the home slot in it
+        h = (number * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        stripe = (h >> 32) % self.stripes
+        home = (h & 0xFFFFFFFF) % self.stripe_slots
+        return stripe, home
+
+    def _lock(self, stripe: int):
+        self._stripe_locks[stripe].acquire()
+        if self._lock_file:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_EX, 1, stripe)
+
+    def _unlock(self, stripe: int):
+        if self._lock_file:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, stripe)
+        self._stripe_locks[stripe].release()
+
+    def _offset(self, stripe: int, index: int) -> int:
+        return self._HEADER.size + (stripe * self.stripe_slots + index) * self._SLOT.size
+
+    def get(self, number: int) -> Optional[Tuple[bool, int]]:
+        #Returns (is_prime, smallest_factor) or None. A smallest_factor of 0 means unknown.
+        if not self.attached or not self._INT64_MIN <= number <= self._INT64_MAX:
+            return None
+
+        stripe, home = self._locate(number)
+        buf = self.shm.buf
+        self._lock(stripe)
+        try:
+            for probe in range(min(self._MAX_PROBES, self.stripe_slots)):
+                key, factor, flags = self._SLOT.unpack_from(
+                    buf, self._offset(stripe, (home + probe) % self.stripe_slots)
+                )
+                if not flags & self._OCCUPIED:
+                    break
+                if key == number:
+                    self.hits += 1
+                    return bool(flags & self._PRIME), factor
+        finally:
+            self._unlock(stripe)
+
+        self.misses += 1
+        return None
+
+    def put(self, number: int, is_prime: bool, smallest_factor: int):
+        #Store a result, overwriting the home slot if the probe window is full.
+        if not self.attached or not self._INT64_MIN <= number <= self._INT64_MAX:
+            return
+        if not self._INT64_MIN <= smallest_factor <= self._INT64_MAX:
+            smallest_factor = 0
+
+        stripe, home = self._locate(number)
+        buf = self.shm.buf
+        flags = self._OCCUPIED | (self._PRIME if is_prime else 0)
+        self._lock(stripe)
+        try:
+            target = self._offset(stripe, home)
+            for probe in range(min(self._MAX_PROBES, self.stripe_slots)):
+                offset = self._offset(stripe, (home + probe) % self.stripe_slots)
+                key, _, existing_flags = self._SLOT.unpack_from(buf, offset)
+                if not existing_flags & self._OCCUPIED or key == number:
+                    target = offset
+                    break
+            self._SLOT.pack_into(buf, target, number, smallest_factor, flags)
+        finally:
+            self._unlock(stripe)
+
+    def get_stats(self) -> Dict[str, Any]:
+        #Per-process hit/miss counters, used for health reporting.
+        lookups = self.hits + self.misses
+        return {
+            "attached": self.attached,
+            "segment": self.name,
+            "slots": self.slots,
+            "stripes": self.stripes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _open_shared_memory(name: str, create: bool, size: int = 0) -> shared_memory.SharedMemory:
+    # The segment must outlive whichever worker created it, so keep it away from the
+    # resource tracker (which would unlink it when that worker exits)
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        from multiprocessing import resource_tracker
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+# Global shared-memory result cache; attached by each worker process at startup
+result_cache = SharedResultCache()
@@ -1,15 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
 
+from app.core.bloom_filter import number_filter
+from app.core.cancellation import CancellationToken, OperationCancelled
 from app.core.config import settings
 from app.core.database import init_db, SessionLocal
 from app.core.queue_manager import queue_manager
+from app.core.shared_cache import result_cache
 from app.api.routes import prime
 from app.services.prime_service import PrimeService
 
 
-def process_prime_job(job_id: str, number: int):
+def process_prime_job(job_id: str, number: int, token: Optional[CancellationToken] = None):
     """
     Job processor callback for the queue manager.
     Processes prime checking jobs with database persistence.
@@ -21,7 +26,7 @@ def process_prime_job(job_id: str, number: int):
         transaction_id = PrimeService.generate_transaction_id()
         
         # Check if number is prime (with caching and optimization)
-        is_prime, was_cached = PrimeService.check_prime_with_cache(db, number)
+        is_prime, was_cached = PrimeService.check_prime_with_cache(db, number, token)
         
         # Save to database
         PrimeService.create_prime_check(
@@ -39,6 +44,106 @@ def process_prime_job(job_id: str, number: int):
         db.close()
 
 
+def process_prime_batch(
+    jobs: List[Tuple[str, int]]
+) -> Dict[str, Tuple[Optional[bool], Optional[str], Optional[str]]]:
+    """
+    Batch lookup callback for the queue manager.
+    Resolves cached numbers with one query and persists their results in a single
+    transaction. Jobs whose number is not cached are left out of the result and
+    handed to compute_prime_batch.
+    Returns: {job_id: (is_prime, transaction_id, error)}
+    """
+    db = SessionLocal()
+    try:
+        try:
+            cached = PrimeService.lookup_cached_primes(db, {number for _, number in jobs})
+        except Exception as e:
+            return {job_id: (None, None, str(e)) for job_id, _ in jobs}
+        
+        return _save_checks(db, [
+            (job_id, number, PrimeService.generate_transaction_id(), cached[number])
+            for job_id, number in jobs
+            if number in cached
+        ])
+        
+    finally:
+        db.close()
+
+
+def compute_prime_batch(
+    jobs: List[Tuple[str, int, CancellationToken]]
+) -> Dict[str, Tuple[Optional[bool], Optional[str], Optional[str]]]:
+    """
+    Batch compute callback for the queue manager.
+    Computes the batch's cache misses against one known-primes query, each under its
+    own job token, and persists every result in a single transaction.
+    A job that is cancelled or runs past its deadline fails alone; a later job with
+    the same number computes it under its own token.
+    Returns: {job_id: (is_prime, transaction_id, error)}
+    """
+    db = SessionLocal()
+    try:
+        try:
+            known_primes = PrimeService.get_known_primes_for(db, {number for _, number, _ in jobs})
+        except Exception as e:
+            return {job_id: (None, None, str(e)) for job_id, _, _ in jobs}
+        
+        computed: Dict[int, bool] = {}
+        outcome = {}
+        rows = []
+        for job_id, number, token in jobs:
+            if number not in computed:
+                try:
+                    computed[number] = PrimeService.compute_prime(db, number, token, known_primes)
+                except OperationCancelled as e:
+                    outcome[job_id] = (None, None, str(e))
+                    continue
+            rows.append((job_id, number, PrimeService.generate_transaction_id(), computed[number]))
+        
+        outcome.update(_save_checks(db, rows))
+        return outcome
+        
+    finally:
+        db.close()
+
+
+def _save_checks(
+    db: Session,
+    rows: List[Tuple[str, int, str, bool]]
+) -> Dict[str, Tuple[Optional[bool], Optional[str], Optional[str]]]:
+    # Persists (job_id, number, transaction_id, is_prime) rows in one transaction,
+    # falling back to one insert per row so a bad row does not fail the others
+    if not rows:
+        return {}
+    
+    try:
+        PrimeService.create_prime_checks(
+            db, [(number, transaction_id, is_prime) for _, number, transaction_id, is_prime in rows]
+        )
+        return {
+            job_id: (is_prime, transaction_id, None)
+            for job_id, _, transaction_id, is_prime in rows
+        }
+    except Exception:
+        db.rollback()
+    
+    outcome = {}
+    for job_id, number, transaction_id, is_prime in rows:
+        try:
+            PrimeService.create_prime_check(
+                db=db,
+                number=number,
+                transaction_id=transaction_id,
+                is_prime=is_prime
+            )
+            outcome[job_id] = (is_prime, transaction_id, None)
+        except Exception as e:
+            db.rollback()
+            outcome[job_id] = (None, None, str(e))
+    return outcome
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -50,10 +155,44 @@ async def lifespan(app: FastAPI):
     init_db()
     print("✓ Database initialized successfully")
     
+    # Attach to the result cache shared by all worker processes
+    if settings.SHARED_CACHE_ENABLED:
+        result_cache.attach(
+            name=settings.SHARED_CACHE_NAME,
+            slots=settings.SHARED_CACHE_SLOTS,
+            stripes=settings.SHARED_CACHE_STRIPES,
+            lock_path=settings.SHARED_CACHE_LOCK_PATH
+        )
+        print(f"✓ Attached shared result cache '{settings.SHARED_CACHE_NAME}' ({result_cache.slots} slots)")
+    
+    # Build the negative cache of numbers already stored
+    if settings.BLOOM_FILTER_ENABLED:
+        print("🧮 Building number Bloom filter...")
+        if settings.BLOOM_FILTER_PATH and number_filter.load(settings.BLOOM_FILTER_PATH):
+            print(f"✓ Loaded Bloom filter snapshot ({number_filter.count} numbers)")
+        db = SessionLocal()
+        try:
+            scanned = PrimeService.build_number_filter(db)
+        finally:
+            db.close()
+        number_filter.ready = True
+        print(f"✓ Bloom filter ready ({scanned} rows scanned, {number_filter.count} numbers)")
+    
     # Initialize queue manager
     print(f"🔧 Initializing queue manager with {settings.QUEUE_WORKERS} workers...")
     queue_manager.num_workers = settings.QUEUE_WORKERS
+    queue_manager.min_workers = settings.QUEUE_MIN_WORKERS
+    queue_manager.max_workers = settings.QUEUE_MAX_WORKERS
+    queue_manager.scale_interval = settings.QUEUE_SCALE_INTERVAL_SECONDS
+    queue_manager.scale_up_wait = settings.QUEUE_SCALE_UP_WAIT_SECONDS
+    queue_manager.scale_cooldown = settings.QUEUE_SCALE_COOLDOWN_SECONDS
+    queue_manager.idle_timeout = settings.QUEUE_WORKER_IDLE_SECONDS
+    queue_manager.batch_size = settings.QUEUE_BATCH_SIZE
+    queue_manager.batch_wait_ms = settings.QUEUE_BATCH_WAIT_MS
+    queue_manager.job_timeout = settings.JOB_TIMEOUT_SECONDS
     queue_manager.set_job_processor(process_prime_job)
+    queue_manager.set_batch_processor(process_prime_batch)
+    queue_manager.set_batch_compute_processor(compute_prime_batch)
     queue_manager.start()
     print("✓ Queue manager initialized successfully")
     
@@ -62,6 +201,15 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 Shutting down application...")
     queue_manager.stop()
+    if settings.BLOOM_FILTER_ENABLED and settings.BLOOM_FILTER_PATH:
+        # Catch up on rows other workers inserted so the snapshot's last_id is current
+        db = SessionLocal()
+        try:
+            PrimeService.build_number_filter(db)
+        finally:
+            db.close()
+        number_filter.save(settings.BLOOM_FILTER_PATH)
+    result_cache.close()
     print("✓ Application shutdown complete")
 
 
@@ -100,6 +248,9 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "ok",
-        "database": "connected"
+        "database": "connected",
+        "queue": queue_manager.get_stats(),
+        "number_filter": number_filter.get_stats(),
+        "shared_cache": result_cache.get_stats()
     }
 
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import IntegerNumeric
 
 
 class PrimeCheckJob(Base):
@@ -11,9 +12,9 @@ class PrimeCheckJob(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     job_id = Column(String, unique=True, index=True, nullable=False)
     transaction_id = Column(String, index=True, nullable=True)
-    number = Column(Integer, nullable=False, index=True)
+    number = Column(IntegerNumeric, nullable=False, index=True)
     is_prime = Column(Boolean, nullable=True)
-    status = Column(String, nullable=False, default="pending")  # pending, processing, completed, failed
+    status = Column(String, nullable=False, default="pending")  # pending, processing, completed, failed, cancelled
     error = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.types import IntegerNumeric
 
 
 class PrimeCheckRequest(Base):
@@ -10,7 +11,7 @@ class PrimeCheckRequest(Base):
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     transaction_id = Column(String, unique=True, index=True, nullable=False)
-    number = Column(Integer, nullable=False, index=True)
+    number = Column(IntegerNumeric, nullable=False, index=True)
     is_prime = Column(Boolean, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
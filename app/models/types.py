@@ -0,0 +1,15 @@
+from sqlalchemy import Numeric
+from sqlalchemy.types import TypeDecorator
+
+
+class IntegerNumeric(TypeDecorator):
+    #Arbitrary-precision integer stored as NUMERIC; values come back as Python ints, not Decimals.
+    
+    impl = Numeric
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(value)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else int(value)
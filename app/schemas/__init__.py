@@ -2,8 +2,10 @@
 
 from app.schemas.prime import (
     PrimeCheckRequest,
-    PrimeCheckResponse
-    
+    PrimeCheckResponse,
+    PrimeCountResponse,
+    NthPrimeResponse,
+    NearestPrimeResponse
 )
 from app.schemas.job import (
     JobSubmitResponse,
@@ -13,6 +15,9 @@ from app.schemas.job import (
 __all__ = [
     "PrimeCheckRequest",
     "PrimeCheckResponse",
+    "PrimeCountResponse",
+    "NthPrimeResponse",
+    "NearestPrimeResponse",
     "JobSubmitResponse",
     "JobStatusResponse"
 ]
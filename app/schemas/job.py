@@ -24,7 +24,7 @@ class JobStatusResponse(BaseModel):
     #Response schema for job status queries.
     
     job_id: str = Field(..., description="Unique job identifier")
-    status: str = Field(..., description="Current job status: pending, processing, completed, or failed")
+    status: str = Field(..., description="Current job status: pending, processing, completed, failed, or cancelled")
     number: int = Field(..., description="The number being checked")
     is_prime: Optional[bool] = Field(None, description="Whether the number is prime (available when completed)")
     transaction_id: Optional[str] = Field(None, description="Transaction ID from database (available when completed)")
@@ -1,12 +1,25 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import Optional
 
+from app.core.config import settings
+
 
 class PrimeCheckRequest(BaseModel):
     #Request schema for prime number checking.This is the request body for the prime check endpoint.
     
-    number: int = Field(..., description="The number to check if it's prime", example=17)
+    number: int = Field(
+        ...,
+        description="The number to check if it's prime (arbitrary precision, also accepted as a string)",
+        example=17
+    )
+    
+    @field_validator("number")
+    @classmethod
+    def limit_digits(cls, value: int) -> int:
+        if len(str(abs(value))) > settings.MAX_NUMBER_DIGITS:
+            raise ValueError(f"number must have at most {settings.MAX_NUMBER_DIGITS} digits")
+        return value
     
     class Config:
         json_schema_extra = {
@@ -29,3 +42,58 @@ class PrimeCheckResponse(BaseModel):
         from_attributes = True
 
 
+class PrimeCountResponse(BaseModel):
+    #Response schema for prime counting.
+    
+    upto: int = Field(..., description="Upper bound (inclusive)")
+    count: int = Field(..., description="Number of primes less than or equal to upto")
+    message: str = Field(..., description="Message about the result")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "upto": 1000000,
+                "count": 78498,
+                "message": "There are 78498 primes up to 1000000"
+            }
+        }
+
+
+class NthPrimeResponse(BaseModel):
+    #Response schema for the nth prime lookup.
+    
+    n: int = Field(..., description="1-based index of the prime")
+    prime: int = Field(..., description="The nth prime number")
+    message: str = Field(..., description="Message about the result")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "n": 1000,
+                "prime": 7919,
+                "message": "The 1000th prime is 7919"
+            }
+        }
+
+
+class NearestPrimeResponse(BaseModel):
+    #Response schema for next/previous prime searches.
+    
+    transaction_id: str = Field(..., description="Transaction identifier of the recorded prime")
+    number: int = Field(..., description="The number the search started from")
+    prime: int = Field(..., description="The nearest prime in the requested direction")
+    gap: int = Field(..., description="Distance between number and prime")
+    message: str = Field(..., description="Message about the result")
+    created_at: datetime = Field(..., description="Timestamp of the request")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "transaction_id": "TXN-1700000000000-XYZ789",
+                "number": 100,
+                "prime": 101,
+                "gap": 1,
+                "message": "The next prime after 100 is 101",
+                "created_at": "2024-11-17T12:00:00Z"
+            }
+        }
@@ -0,0 +1,173 @@
+import math
+import random
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from typing import Iterator, List, Optional
+
+from app.core.cancellation import CancellationToken
+
+try:
+    import gmpy2
+except ImportError:  # Optional accelerator; pure Python is used without it
+    gmpy2 = None
+
+
+# True when gmpy2's native big-integer routines are available
+HAS_GMPY2 = gmpy2 is not None
+
+# Miller-Rabin rounds beyond the deterministic range
+PROBABLE_PRIME_ROUNDS = 25
+
+# Miller-Rabin with these bases is exact for n < 3.3 * 10^24
+_DETERMINISTIC_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+_DETERMINISTIC_LIMIT = 3_317_044_064_679_887_385_961_981
+
+_SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97)
+
+# Mod-210 wheel: only the 48 residues coprime to 2*3*5*7 can be primes above 7
+_WHEEL = 210
+_WHEEL_PRIMES = (2, 3, 5, 7)
+_WHEEL_RESIDUES = [r for r in range(_WHEEL) if math.gcd(r, _WHEEL) == 1]
+
+# Candidate windows are sieved by the primes below this before any Miller-Rabin test,
+# which leaves about 1 in 25 numbers; the window is a few times the average prime gap
+_WINDOW_SIEVE_LIMIT = 1 << 16
+_WINDOW_GAPS = 4
+
+
+def _primes_below(limit: int) -> List[int]:
+    flags = bytearray([1]) * limit
+    flags[:2] = b"\x00\x00"
+    for i in range(2, math.isqrt(limit - 1) + 1):
+        if flags[i]:
+            flags[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return list(compress(range(limit), flags))
+
+
+_WINDOW_SIEVE_PRIMES = _primes_below(_WINDOW_SIEVE_LIMIT)
+
+
+def is_probable_prime(n: int, token: Optional[CancellationToken] = None) -> bool:
+    #Miller-Rabin primality test; exact below 3.3 * 10^24, error below 4^-25 above it.
+    if n < 2:
+        return False
+    if HAS_GMPY2:
+        return bool(gmpy2.is_prime(n, PROBABLE_PRIME_ROUNDS))
+
+    for p in _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    if n < _DETERMINISTIC_LIMIT:
+        bases = _DETERMINISTIC_BASES
+    else:
+        bases = _DETERMINISTIC_BASES + tuple(
+            random.randrange(2, n - 1) for _ in range(PROBABLE_PRIME_ROUNDS - len(_DETERMINISTIC_BASES))
+        )
+
+    for a in bases:
+        if token:
+            token.check()
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+
+    return True
+
+
+def _wheel_up(start: int) -> Iterator[int]:
+    #Ascending numbers >= start that are coprime to 210.
+    base = start - start % _WHEEL
+    index = bisect_left(_WHEEL_RESIDUES, start % _WHEEL)
+    while True:
+        if index == len(_WHEEL_RESIDUES):
+            base += _WHEEL
+            index = 0
+        yield base + _WHEEL_RESIDUES[index]
+        index += 1
+
+
+def _wheel_down(start: int) -> Iterator[int]:
+    #Descending numbers <= start that are coprime to 210.
+    base = start - start % _WHEEL
+    index = bisect_right(_WHEEL_RESIDUES, start % _WHEEL) - 1
+    while True:
+        if index < 0:
+            base -= _WHEEL
+            index = len(_WHEEL_RESIDUES) - 1
+        yield base + _WHEEL_RESIDUES[index]
+        index -= 1
+
+
+def _window_candidates(lo: int, width: int) -> Iterator[int]:
+    #Numbers in [lo, lo + width) with no factor below _WINDOW_SIEVE_LIMIT, ascending.
+    #Requires lo > _WINDOW_SIEVE_LIMIT so no sieving prime lies inside the window.
+    flags = bytearray([1]) * width
+    for p in _WINDOW_SIEVE_PRIMES:
+        start = -lo % p
+        if start < width:
+            flags[start::p] = bytes(len(range(start, width, p)))
+    return (lo + i for i in compress(range(width), flags))
+
+
+def _window_width(n: int) -> int:
+    # ln(n) is the average gap between primes near n
+    return max(256, int(n.bit_length() * math.log(2) * _WINDOW_GAPS))
+
+
+def next_prime(n: int, token: Optional[CancellationToken] = None) -> int:
+    #Smallest (probable) prime strictly greater than n.
+    if n < _WHEEL_PRIMES[-1]:
+        return next(p for p in _WHEEL_PRIMES if p > n)
+    if HAS_GMPY2:
+        return int(gmpy2.next_prime(n))
+
+    if n < _WINDOW_SIEVE_LIMIT:
+        for candidate in _wheel_up(n + 1):
+            if is_probable_prime(candidate, token):
+                return candidate
+
+    lo = n + 1
+    width = _window_width(n)
+    while True:
+        for candidate in _window_candidates(lo, width):
+            if is_probable_prime(candidate, token):
+                return candidate
+        lo += width
+
+
+def prev_prime(n: int, token: Optional[CancellationToken] = None) -> Optional[int]:
+    #Largest (probable) prime strictly less than n, or None when n <= 2.
+    if n <= 11:
+        smaller = [p for p in _WHEEL_PRIMES if p < n]
+        return smaller[-1] if smaller else None
+    if HAS_GMPY2 and hasattr(gmpy2, "prev_prime"):  # gmpy2 >= 2.2
+        return int(gmpy2.prev_prime(n))
+
+    # The search ends at 11 at the latest, so it never walks below the wheel primes
+    if n <= 2 * _WINDOW_SIEVE_LIMIT:
+        for candidate in _wheel_down(n - 1):
+            if is_probable_prime(candidate, token):
+                return candidate
+
+    # There is always a prime between n / 2 and n, so the windows stay above the sieving primes
+    hi = n
+    width = _window_width(n)
+    while True:
+        lo = max(hi - width, _WINDOW_SIEVE_LIMIT + 1)
+        for candidate in reversed(list(_window_candidates(lo, hi - lo))):
+            if is_probable_prime(candidate, token):
+                return candidate
+        hi = lo
@@ -0,0 +1,350 @@
+import copy
+import math
+import threading
+from collections import OrderedDict
+from itertools import compress
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cancellation import CHECK_EVERY, CancellationToken
+
+
+# Small primes folded into the phi lookup tables (their product is the table period)
+PHI_TABLE_PRIMES = 7
+
+# Upper bound for the in-memory sieve used to answer pi(y) for small y.
+# Meissel's formula needs pi() up to x^(2/3), so 10^8 covers x up to 10^12 (~50MB).
+MAX_SIEVE_LIMIT = 100_000_000
+
+# Odd numbers per prefix-count block of the sieve
+_BLOCK = 512
+
+# Most recent pi(x) results above the sieve limit kept for repeated requests
+PI_CACHE_SIZE = 256
+
+
+def _sieve(limit: int) -> bytearray:
+    #Sieve of Eratosthenes: flags[i] == 1 iff i is prime, for 0 <= i <= limit.
+    flags = bytearray([1]) * (limit + 1)
+    flags[0] = 0
+    if limit >= 1:
+        flags[1] = 0
+    for i in range(2, math.isqrt(limit) + 1):
+        if flags[i]:
+            flags[i * i::i] = bytes(len(range(i * i, limit + 1, i)))
+    return flags
+
+
+def _odd_sieve(limit: int) -> bytearray:
+    #Odd-only sieve: flags[k] == 1 iff 2k + 1 is prime, for 2k + 1 <= limit.
+    size = (limit + 1) // 2
+    flags = bytearray([1]) * size
+    flags[0] = 0
+    for i in range(3, math.isqrt(limit) + 1, 2):
+        if flags[i // 2]:
+            start = i * i // 2
+            flags[start::i] = bytes(len(range(start, size, i)))
+    return flags
+
+
+class PrimeCounter:
+
+    #Meissel-Lehmer prime counting with memoized phi tables.
+    #pi(y) for y up to the sieve limit is a prefix-count lookup into an odd-only sieve;
+    #above that Meissel's formula reduces pi(x) to phi(x, a) and pi(x / p) for
+    #x^(1/3) < p <= x^(1/2), all of which stay below x^(2/3). Only the top-level pi(x) ever
+    #misses the sieve, so large results are kept in a small LRU that serves exact repeats;
+    #the phi() memo only lives for one call since it grows with x.
+    #The lock only guards growing the tables. Growth replaces them rather than mutating them,
+    #so each call computes on a snapshot without blocking concurrent calls.
+
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sieve_limit = 0
+        self.primes_limit = 0
+        self._flags = bytearray()
+        self._block_counts: List[int] = []
+        self.primes: List[int] = []
+        self._pi_cache: "OrderedDict[int, int]" = OrderedDict()
+        self._pi_cache_lock = threading.Lock()
+        self._phi_cache: Dict[Tuple[int, int], int] = {}
+        self.token: Optional[CancellationToken] = None
+        self._steps = 0
+
+        # phi(x, a) for a <= PHI_TABLE_PRIMES is periodic in x with period Q = p1 * ... * pa,
+        # so one table of phi(r, a) for r < Q answers every x.
+        self._phi_tables: List[Tuple[int, int, List[int]]] = []
+        self._ensure_sieve(1000)
+        self._build_phi_tables()
+
+    def _ensure_sieve(self, limit: int):
+        limit = min(max(limit, 1000), MAX_SIEVE_LIMIT)
+        if limit <= self.sieve_limit:
+            return
+
+        flags = _odd_sieve(limit)
+        block_counts = [0]
+        total = 0
+        for start in range(0, len(flags), _BLOCK):
+            total += flags.count(1, start, start + _BLOCK)
+            block_counts.append(total)
+
+        self._flags = flags
+        self._block_counts = block_counts
+        self.sieve_limit = limit
+        self.primes_limit = 0
+        # Explicit primes are only needed up to sqrt(x), about limit^(3/4)
+        self._ensure_primes(int(limit ** 0.75) + 1)
+    
+    def _ensure_primes(self, limit: int):
+        limit = min(limit, self.sieve_limit)
+        if limit <= self.primes_limit:
+            return
+        odd_count = (limit + 1) // 2
+        self.primes = [2] + [2 * k + 1 for k in compress(range(odd_count), self._flags[:odd_count])]
+        self.primes_limit = limit
+
+    def _build_phi_tables(self):
+        period = 1
+        coprime = bytearray([1])
+        for p in self.primes[:PHI_TABLE_PRIMES]:
+            period *= p
+            coprime = coprime * p
+            coprime[0::p] = bytes(len(range(0, period, p)))
+
+            # counts[r] = number of 1 <= k <= r coprime to the first a primes
+            counts = [0] * period
+            total = 0
+            for r in range(period):
+                total += coprime[r]
+                counts[r] = total
+            self._phi_tables.append((period, total, counts))
+
+    def _phi(self, x: int, a: int) -> int:
+        #Count of 1 <= k <= x not divisible by any of the first a primes.
+        if a == 0:
+            return x
+        if a <= len(self._phi_tables):
+            period, per_period, counts = self._phi_tables[a - 1]
+            return (x // period) * per_period + counts[x % period]
+        primes = self.primes
+        if x <= primes[a - 1]:
+            return 1
+        if x <= self.sieve_limit and a < len(primes) and x < primes[a] ** 2:
+            # Only 1 and the primes above p_a survive
+            return self._pi_small(x) - a + 1
+
+        key = (x, a)
+        cached = self._phi_cache.get(key)
+        if cached is not None:
+            return cached
+        self._tick()
+
+        # phi(x, a) = phi(x, a - 1) - phi(x / p_a, a - 1), unrolled down to the table size
+        result = self._phi(x, len(self._phi_tables))
+        i = len(self._phi_tables)
+        while i < a:
+            y = x // primes[i]
+            if y <= self.sieve_limit and y < primes[i] ** 2:
+                break
+            result -= self._phi(y, i)
+            i += 1
+        
+        # From here on y only shrinks while p grows, so every term is a leaf:
+        # phi(y, i) = pi(y) - i + 1 while y >= p_i, and 1 once x / p_i < p_i
+        if i < a:
+            end = min(a, self._pi_small(math.isqrt(x)))
+            if end > i:
+                flags = self._flags
+                block_counts = self._block_counts
+                leaves = 0
+                for p in primes[i:end]:
+                    k = (x // p - 1) >> 1
+                    block = k // _BLOCK
+                    leaves += block_counts[block] + flags.count(1, block * _BLOCK, k + 1)
+                # Each pi(y) is 1 + leaves term; subtract (pi(y) - j + 1) for j in [i, end)
+                result -= leaves + (end - i) * 2 - (end - i) * (i + end - 1) // 2
+                i = end
+            result -= a - i
+
+        self._phi_cache[key] = result
+        return result
+
+    def _pi_small(self, x: int) -> int:
+        #pi(x) for x <= sieve_limit.
+        if x < 3:
+            return 1 if x == 2 else 0
+        k = (x - 1) // 2
+        block = k // _BLOCK
+        return 1 + self._block_counts[block] + self._flags.count(1, block * _BLOCK, k + 1)
+
+    def _pi(self, x: int) -> int:
+        if x <= self.sieve_limit:
+            return self._pi_small(x)
+
+        with self._pi_cache_lock:
+            cached = self._pi_cache.get(x)
+            if cached is not None:
+                self._pi_cache.move_to_end(x)
+                return cached
+
+        # Meissel: pi(x) = phi(x, a) + a - 1 - P2(x, a), with a = pi(x^1/3), b = pi(x^1/2)
+        # and P2 = sum over p_a < p_i <= p_b of pi(x / p_i) - pi(p_i) + 1
+        a = self._pi(_icbrt(x))
+        b = self._pi(math.isqrt(x))
+
+        primes = self.primes
+        result = self._phi(x, a) + a - 1
+        for i in range(a, b):
+            self._tick()
+            result -= self._pi(x // primes[i]) - i
+
+        with self._pi_cache_lock:
+            self._pi_cache[x] = result
+            if len(self._pi_cache) > PI_CACHE_SIZE:
+                self._pi_cache.popitem(last=False)
+        return result
+
+    def _tick(self):
+        # Called once per non-trivial phi() or pi() step
+        self._steps += 1
+        if self.token and self._steps % CHECK_EVERY == 0:
+            self.token.check()
+
+    def _prepare(self, x: int, token: Optional[CancellationToken] = None) -> "PrimeCounter":
+        #Grow the shared tables for x and return a per-call snapshot to compute on.
+        if x > MAX_SIEVE_LIMIT ** 2:
+            raise ValueError(f"x must be at most {MAX_SIEVE_LIMIT ** 2}")
+        with self.lock:
+            # Sieving to x^(2/3) keeps every pi(x / p) lookup inside the sieve
+            self._ensure_sieve(int(x ** (2 / 3)) + 1)
+            self._ensure_primes(math.isqrt(x) + 1)
+            # The snapshot shares the pi() memo but gets its own phi() memo and token
+            view = copy.copy(self)
+        view._phi_cache = {}
+        view.token = token
+        view._steps = 0
+        return view
+    
+    def count(self, x: int, token: Optional[CancellationToken] = None) -> int:
+        #Number of primes p <= x.
+        #Raises OperationCancelled if the token is cancelled or expires mid-computation.
+        if x < 2:
+            return 0
+        return self._prepare(x, token)._pi(x)
+
+    def nth(self, n: int, token: Optional[CancellationToken] = None) -> int:
+        #The n-th prime, 1-indexed (nth(1) == 2).
+        #Raises OperationCancelled if the token is cancelled or expires mid-computation.
+        if n < 1:
+            raise ValueError("n must be at least 1")
+
+        primes = self.primes
+        if n <= len(primes):
+            return primes[n - 1]
+
+        # Start from the inverse of Riemann's R(x), then walk to the exact prime
+        estimate = _inverse_riemann_r(n)
+        view = self._prepare(estimate, token)
+        if n <= len(view.primes):
+            return view.primes[n - 1]
+
+        counted = view._pi(estimate)
+        if counted >= n:
+            return _walk_down(estimate, counted - n)
+        return _walk_up(estimate, n - counted)
+
+
+def _icbrt(x: int) -> int:
+    #Integer cube root.
+    r = int(round(x ** (1 / 3)))
+    while r * r * r > x:
+        r -= 1
+    while (r + 1) ** 3 <= x:
+        r += 1
+    return r
+
+
+def _li(x: float) -> float:
+    #Logarithmic integral via Ramanujan's series.
+    gamma = 0.5772156649015329
+    ln_x = math.log(x)
+    total = 0.0
+    term = 1.0
+    inner = 0.0
+    for k in range(1, 200):
+        term *= ln_x / k
+        if (k - 1) % 2 == 0:
+            inner += 1.0 / (2 * ((k - 1) // 2) + 1)
+        delta = (-1) ** (k - 1) * term / (2 ** (k - 1)) * inner
+        total += delta
+        if abs(delta) < 1e-12 * abs(total):
+            break
+    return gamma + math.log(ln_x) + math.sqrt(x) * total
+
+
+_MOBIUS = [0, 1, -1, -1, 0, -1, 1, -1, 0, 0, 1, -1, 0, -1, 1, 1, 0, -1, 0, -1, 0,
+           1, 1, -1, 0, 0, 1, 0, 0, -1, -1, -1, 0, 1, 1, 1, 0, -1, 1, 1, 0, -1]
+
+
+def _riemann_r(x: float) -> float:
+    #Riemann's R(x) = sum mu(k)/k li(x^(1/k)), a very close approximation of pi(x).
+    total = 0.0
+    for k in range(1, len(_MOBIUS)):
+        root = x ** (1 / k)
+        if root < 2:
+            break
+        if _MOBIUS[k]:
+            total += _MOBIUS[k] / k * _li(root)
+    return total
+
+
+def _inverse_riemann_r(n: int) -> int:
+    #Newton iteration for the x with R(x) == n.
+    x = n * math.log(n) + n * math.log(math.log(n))
+    for _ in range(50):
+        step = (_riemann_r(x) - n) * math.log(x)
+        x -= step
+        if abs(step) < 0.5:
+            break
+    return int(x)
+
+
+def _segment(lo: int, hi: int) -> List[int]:
+    #Primes in [lo, hi) via a segmented sieve.
+    lo = max(lo, 2)
+    if hi <= lo:
+        return []
+    flags = bytearray([1]) * (hi - lo)
+    for p in compress(range(math.isqrt(hi - 1) + 1), _sieve(math.isqrt(hi - 1))):
+        start = max(p * p, (lo + p - 1) // p * p)
+        flags[start - lo::p] = bytes(len(range(start - lo, hi - lo, p)))
+    return list(compress(range(lo, hi), flags))
+
+
+def _walk_up(x: int, remaining: int) -> int:
+    #The remaining-th prime above x.
+    width = max(1024, int(remaining * math.log(x) * 1.2))
+    lo = x + 1
+    while True:
+        primes = _segment(lo, lo + width)
+        if len(primes) >= remaining:
+            return primes[remaining - 1]
+        remaining -= len(primes)
+        lo += width
+
+
+def _walk_down(x: int, skip: int) -> int:
+    #The largest prime <= x after skipping `skip` primes downward.
+    width = max(1024, int((skip + 1) * math.log(x) * 1.2))
+    hi = x + 1
+    while True:
+        primes = _segment(hi - width, hi)
+        if len(primes) > skip:
+            return primes[len(primes) - 1 - skip]
+        skip -= len(primes)
+        hi -= width
+
+
+# Global prime counter; its sieve, phi tables and pi cache are shared by all requests
+prime_counter = PrimeCounter()
@@ -1,10 +1,24 @@
 import uuid
 import time
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from app.core.bloom_filter import number_filter
+from app.core.cancellation import CHECK_EVERY, CancellationToken
+from app.core.config import settings
+from app.core.shared_cache import result_cache
+from app.services.number_theory import is_probable_prime, next_prime, prev_prime
+from app.services.prime_counting import prime_counter
 from app.models.prime_check import PrimeCheckRequest as DBPrimeCheckRequest
 
 
+# Numbers at or above this use a Miller-Rabin test (gmpy2 when installed) instead of trial division
+TRIAL_DIVISION_LIMIT = 1 << 32
+
+# Trial division bound used to find a small factor of large composites
+LARGE_FACTOR_SEARCH_LIMIT = 10_000
+
+
 class PrimeService:
     #Service class containing business logic for prime number operations.
     
@@ -16,24 +30,32 @@ class PrimeService:
         return f"TXN-{timestamp}-{unique_id}"
     
     @staticmethod
-    def is_prime(n: int) -> bool:
-        
+    def is_prime(n: int, token: Optional[CancellationToken] = None) -> bool:
         
+        return n >= 2 and PrimeService.smallest_factor(n, token) == n
+    
+    @staticmethod
+    def smallest_factor(n: int, token: Optional[CancellationToken] = None) -> int:
+        #Smallest prime factor of n (n itself when prime, 0 when n < 2).
         if n < 2:
-            return False
-        if n == 2:
-            return True
+            return 0
         if n % 2 == 0:
-            return False
+            return 2
+        if n >= TRIAL_DIVISION_LIMIT:
+            return PrimeService._large_smallest_factor(n, token)
         
         
         i = 3
+        steps = 0
         while i * i <= n:
             if n % i == 0:
-                return False
+                return i
             i += 2
+            steps += 1
+            if token and steps % CHECK_EVERY == 0:
+                token.check()
         
-        return True
+        return n
     
     @staticmethod
     def get_by_number(db: Session, number: int) -> Optional[DBPrimeCheckRequest]:
@@ -46,21 +68,78 @@ class PrimeService:
         ).order_by(DBPrimeCheckRequest.created_at.desc()).first()
     
     @staticmethod
-    def check_prime_with_cache(db: Session, number: int) -> Tuple[bool, bool]:
+    def get_by_numbers(db: Session, numbers: Iterable[int]) -> Dict[int, DBPrimeCheckRequest]:
+        """
+        Retrieve stored prime check results for many numbers with a single IN query.
+        Numbers that have never been checked are absent from the returned dict.
+        """
+        # Definite misses according to the Bloom filter are left out of the query
+        numbers = set(numbers)
+        candidates = {n for n in numbers if number_filter.might_contain(n)}
+        if len(candidates) < len(numbers) and PrimeService.sync_number_filter(db):
+            candidates = {n for n in numbers if number_filter.might_contain(n)}
+        numbers = candidates
+        if not numbers:
+            return {}
+        
+        records = db.query(DBPrimeCheckRequest).filter(
+            DBPrimeCheckRequest.number.in_(numbers)
+        ).all()
+        
+        return {record.number: record for record in records}
+    
+    @staticmethod
+    def check_prime_with_cache(
+        db: Session,
+        number: int,
+        token: Optional[CancellationToken] = None
+    ) -> Tuple[bool, bool]:
         #Check if a number is prime, using database cache if available.
         #3Check if a number is prime, using database cache if available.
+        #Raises OperationCancelled if the token is cancelled or expires mid-computation.
         #Returns: (is_prime, was_cached)
         
-        # First, check if we've seen this number before
-        cached_result = PrimeService.get_by_number(db, number)
+        # Results computed by any worker process are shared through shared memory
+        shared = result_cache.get(number)
+        if shared:
+            return shared[0], True
+        
+        # Next, check if we've seen this number before.
+        # The Bloom filter answers "never seen" without touching the database.
+        cached_result = None
+        if PrimeService.might_be_stored(db, number):
+            cached_result = PrimeService.get_by_number(db, number)
         
         if cached_result:
             # Cache hit! Return the stored result
+            result_cache.put(number, cached_result.is_prime, number if cached_result.is_prime else 0)
             return cached_result.is_prime, True
         
         # Cache miss - calculate it with optimization
-        is_prime = PrimeService.is_prime_optimized(db, number)
-        return is_prime, False
+        return PrimeService.compute_prime(db, number, token), False
+    
+    @staticmethod
+    def compute_prime(
+        db: Session,
+        number: int,
+        token: Optional[CancellationToken] = None,
+        known_primes: Optional[List[int]] = None
+    ) -> bool:
+        #Compute whether a number is prime, skipping every cache, and publish the result.
+        #known_primes (from get_known_primes_for) lets a batch share one known-primes query.
+        #The token's deadline starts here, so time spent on lookups does not count against it.
+        if token:
+            token.start()
+            token.check()
+        if known_primes is None:
+            factor = PrimeService.smallest_factor_optimized(db, number, token)
+        elif number < 1000 or number >= TRIAL_DIVISION_LIMIT or number % 2 == 0:
+            factor = PrimeService.smallest_factor(number, token)
+        else:
+            factor = PrimeService._trial_division(number, known_primes, token)
+        is_prime = number >= 2 and factor == number
+        result_cache.put(number, is_prime, factor)
+        return is_prime
     
     @staticmethod
     def get_known_primes_up_to(db: Session, limit: int) -> List[int]:
@@ -74,25 +153,60 @@ class PrimeService:
         return [r[0] for r in results]
     
     @staticmethod
-    def is_prime_optimized(db: Session, n: int) -> bool:
+    def get_known_primes_for(db: Session, numbers: Iterable[int]) -> List[int]:
+        #Known primes up to the square root of the largest number that uses trial division.
+        trial = [n for n in numbers if 1000 <= n < TRIAL_DIVISION_LIMIT and n % 2 == 1]
+        if not trial:
+            return []
+        return PrimeService.get_known_primes_up_to(db, int(max(trial) ** 0.5) + 1)
+    
+    @staticmethod
+    def is_prime_optimized(db: Session, n: int, token: Optional[CancellationToken] = None) -> bool:
         """
         Optimized prime check using known primes from database for trial division.
         Falls back to standard algorithm if no primes in database or for small numbers.
         """
+        return n >= 2 and PrimeService.smallest_factor_optimized(db, n, token) == n
+    
+    @staticmethod
+    def smallest_factor_optimized(db: Session, n: int, token: Optional[CancellationToken] = None) -> int:
+        #Smallest prime factor of n using known primes from database (n when prime, 0 when n < 2).
         if n < 2:
-            return False
-        if n == 2:
-            return True
+            return 0
         if n % 2 == 0:
-            return False
+            return 2
         
-        # For smaller numbers, use standard algorithm (faster than DB query)
-        if n < 1000:
-            return PrimeService.is_prime(n)
+        # For smaller numbers, use standard algorithm (faster than DB query);
+        # large numbers go straight to the probable-prime test
+        if n < 1000 or n >= TRIAL_DIVISION_LIMIT:
+            return PrimeService.smallest_factor(n, token)
         
         # Get known primes up to sqrt(n) from database
         limit = int(n ** 0.5) + 1
         known_primes = PrimeService.get_known_primes_up_to(db, limit)
+        return PrimeService._trial_division(n, known_primes, token)
+    
+    @staticmethod
+    def _large_smallest_factor(n: int, token: Optional[CancellationToken] = None) -> int:
+        #Smallest factor of a large odd n: n if it is a probable prime, otherwise the smallest
+        #factor below LARGE_FACTOR_SEARCH_LIMIT, or 0 if it has none that small.
+        if is_probable_prime(n, token):
+            return n
+        
+        i = 3
+        while i < LARGE_FACTOR_SEARCH_LIMIT:
+            if n % i == 0:
+                return i
+            i += 2
+        
+        return 0
+    
+    @staticmethod
+    def _trial_division(n: int, known_primes: List[int], token: Optional[CancellationToken] = None) -> int:
+        #Trial division of odd n >= 3 using known primes first, then odd candidates.
+        #Returns the smallest prime factor found, or n itself when n is prime.
+        limit = int(n ** 0.5) + 1
+        steps = 0
         
         if known_primes and len(known_primes) > 10:
             # Use known primes as trial divisors (faster than checking all odd numbers)
@@ -100,7 +214,10 @@ class PrimeService:
                 if prime * prime > n:
                     break
                 if n % prime == 0:
-                    return False
+                    return prime
+                steps += 1
+                if token and steps % CHECK_EVERY == 0:
+                    token.check()
             
             # Continue checking from where known primes end
             start = known_primes[-1] + 2 if known_primes[-1] < limit else limit + 1
@@ -112,10 +229,55 @@ class PrimeService:
         i = start
         while i * i <= n:
             if n % i == 0:
-                return False
+                return i
             i += 2
+            steps += 1
+            if token and steps % CHECK_EVERY == 0:
+                token.check()
         
-        return True
+        return n
+    
+    @staticmethod
+    def lookup_cached_primes(db: Session, numbers: Iterable[int]) -> Dict[int, bool]:
+        """
+        Batch cache lookup used by the queue's micro-batches.
+        Consults the shared-memory cache first and resolves the rest with one query.
+        Numbers that were never checked are absent from the result; computing them is left
+        to the caller so that slow misses do not hold up the hits.
+        Returns: {number: is_prime}
+        """
+        results = {}
+        pending = set()
+        for n in numbers:
+            shared = result_cache.get(n)
+            if shared:
+                results[n] = shared[0]
+            else:
+                pending.add(n)
+        
+        cached = PrimeService.get_by_numbers(db, pending)
+        for number, record in cached.items():
+            results[number] = record.is_prime
+            result_cache.put(number, record.is_prime, number if record.is_prime else 0)
+        
+        return results
+    
+    @staticmethod
+    def create_prime_checks(db: Session, checks: List[Tuple[int, str, bool]]) -> List[DBPrimeCheckRequest]:
+        #Save many (number, transaction_id, is_prime) records in a single transaction.
+        db_records = [
+            DBPrimeCheckRequest(
+                transaction_id=transaction_id,
+                number=number,
+                is_prime=is_prime
+            )
+            for number, transaction_id, is_prime in checks
+        ]
+        db.add_all(db_records)
+        db.commit()
+        for number, _, _ in checks:
+            number_filter.add(number)
+        return db_records
     
     @staticmethod
     def create_prime_check(db: Session, number: int, transaction_id: str, is_prime: bool) -> DBPrimeCheckRequest:
@@ -128,6 +290,7 @@ class PrimeService:
         db.add(db_record)
         db.commit()
         db.refresh(db_record)
+        number_filter.add(number)
         return db_record
     
     @staticmethod
@@ -136,4 +299,82 @@ class PrimeService:
         return db.query(DBPrimeCheckRequest).filter(
             DBPrimeCheckRequest.transaction_id == transaction_id
         ).first()
-    
\ No newline at end of file
+    
+    @staticmethod
+    def might_be_stored(db: Session, number: int) -> bool:
+        #Bloom filter check that first catches up on rows other workers inserted before trusting a "no".
+        if number_filter.might_contain(number):
+            return True
+        return PrimeService.sync_number_filter(db) and number_filter.might_contain(number)
+    
+    @staticmethod
+    def sync_number_filter(db: Session) -> bool:
+        #Fold rows inserted since the last scan into the filter, at most once per BLOOM_FILTER_SYNC_SECONDS.
+        #Returns True if any new rows were found.
+        if not number_filter.ready or not number_filter.claim_sync(settings.BLOOM_FILTER_SYNC_SECONDS):
+            return False
+        return PrimeService.build_number_filter(db) > 0
+    
+    @staticmethod
+    def build_number_filter(db: Session, batch_size: int = 10000) -> int:
+        """
+        Fold every stored number newer than the filter's last_id into the Bloom filter,
+        along with rows whose ids were skipped by earlier scans and have committed since.
+        Streams rows in id order so memory stays flat regardless of table size.
+        Returns the number of rows scanned.
+        """
+        newer = DBPrimeCheckRequest.id > number_filter.last_id
+        missing = list(number_filter.missing_ids)
+        if missing:
+            newer = or_(newer, DBPrimeCheckRequest.id.in_(missing))
+        rows = db.query(DBPrimeCheckRequest.id, DBPrimeCheckRequest.number).filter(
+            newer
+        ).order_by(DBPrimeCheckRequest.id).yield_per(batch_size)
+        
+        scanned = 0
+        for row_id, number in rows:
+            number_filter.add(number)
+            number_filter.mark_seen(row_id)
+            scanned += 1
+        
+        number_filter.expire_missing(settings.BLOOM_FILTER_GAP_SECONDS)
+        return scanned
+    
+    @staticmethod
+    def count_primes(upto: int, token: Optional[CancellationToken] = None) -> int:
+        #Number of primes <= upto (Meissel-Lehmer, memoized across calls).
+        return prime_counter.count(upto, token)
+    
+    @staticmethod
+    def nth_prime(n: int, token: Optional[CancellationToken] = None) -> int:
+        #The nth prime, 1-indexed.
+        return prime_counter.nth(n, token)
+    
+    @staticmethod
+    def find_nearest_prime(
+        db: Session,
+        number: int,
+        direction: str,
+        token: Optional[CancellationToken] = None
+    ) -> Optional[DBPrimeCheckRequest]:
+        """
+        Find the next (direction="next") or previous (direction="prev") prime of a number.
+        Candidates are searched server-side on a mod-210 wheel with a probable-prime test;
+        only the prime that is found gets a transaction record.
+        Returns None when there is no prime below the number.
+        """
+        if direction == "next":
+            prime = next_prime(number, token)
+        else:
+            prime = prev_prime(number, token)
+        
+        if prime is None:
+            return None
+        
+        result_cache.put(prime, True, prime)
+        return PrimeService.create_prime_check(
+            db=db,
+            number=prime,
+            transaction_id=PrimeService.generate_transaction_id(),
+            is_prime=True
+        )